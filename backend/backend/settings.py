@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 import os
 from pathlib import Path
+from urllib.parse import urlsplit
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -94,6 +95,33 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# Use Redis when available (shared across web and worker processes),
+# local memory otherwise. Without an explicit CACHE_URL the broker's Redis is
+# reused, but on the next database index: cache.clear() runs FLUSHDB, which
+# must never wipe queued Celery tasks.
+CACHE_URL = os.environ.get('CACHE_URL')
+if not CACHE_URL and os.environ.get('CELERY_BROKER_URL'):
+    _broker_url = urlsplit(os.environ['CELERY_BROKER_URL'])
+    _broker_db = int(_broker_url.path.strip('/') or 0)
+    CACHE_URL = _broker_url._replace(path=f'/{_broker_db + 1}').geturl()
+if CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -145,9 +173,16 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
 # Celery task settings
+# Each task class gets its own queue so worker concurrency can be tuned
+# independently: provisioning is long-running, status polling is short and
+# I/O bound.
 CELERY_TASK_ROUTES = {
-    'tenants.tasks.provision_tenant_infrastructure': {'queue': 'infrastructure'},
-    'tenants.tasks.cleanup_tenant_infrastructure': {'queue': 'infrastructure'},
+    'tenants.tasks.provision_tenant_infrastructure': {'queue': 'tenant_provision'},
+    'tenants.tasks.mark_provisioning_failed': {'queue': 'tenant_provision'},
+    'tenants.tasks.cleanup_tenant_infrastructure': {'queue': 'tenant_cleanup'},
+    'tenants.tasks.delete_render_service': {'queue': 'tenant_cleanup'},
+    'tenants.tasks.finalize_tenant_cleanup': {'queue': 'tenant_cleanup'},
+    'tenants.tasks.check_tenant_service_status': {'queue': 'tenant_status'},
 }
 
 # Celery worker settings
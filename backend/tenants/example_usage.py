@@ -9,19 +9,13 @@ This script demonstrates how to:
 
 import os
 import django
-from django.conf import settings
-
-# Setup Django environment
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
-django.setup()
-
-from tenants.models import Tenant
-from tenants.tasks import provision_tenant_infrastructure, cleanup_tenant_infrastructure, check_tenant_service_status
 
 def create_tenant_with_custom_plugins():
     """
     Example: Create a tenant that needs custom plugins.
     """
+    from tenants.models import Tenant
+    
     print("=== Creating Tenant with Custom Plugins ===")
     
     # Create a tenant with custom plugin repository
@@ -40,6 +34,8 @@ def create_standard_tenant():
     """
     Example: Create a tenant without custom plugins.
     """
+    from tenants.models import Tenant
+    
     print("=== Creating Standard Tenant ===")
     
     # Create a tenant without custom plugins
@@ -57,6 +53,8 @@ def provision_tenant_example(tenant):
     """
     Example: Provision infrastructure for a tenant.
     """
+    from tenants.tasks import provision_tenant_infrastructure
+    
     print(f"\n=== Provisioning Infrastructure for {tenant.name} ===")
     
     # Trigger the provisioning task
@@ -83,6 +81,8 @@ def check_service_status_example(tenant):
     """
     Example: Check the status of tenant services.
     """
+    from tenants.tasks import check_tenant_service_status
+    
     print(f"\n=== Checking Service Status for {tenant.name} ===")
     
     try:
@@ -95,6 +95,8 @@ def cleanup_tenant_example(tenant):
     """
     Example: Clean up infrastructure for a tenant.
     """
+    from tenants.tasks import cleanup_tenant_infrastructure
+    
     print(f"\n=== Cleaning Up Infrastructure for {tenant.name} ===")
     
     try:
@@ -150,4 +152,8 @@ def main():
     print("• Infrastructure cleanup")
 
 if __name__ == "__main__":
+    # Setup Django environment only when run as a script, so importing this
+    # module has no side effects
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    django.setup()
     main()
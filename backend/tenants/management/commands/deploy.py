@@ -1,10 +1,18 @@
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
 from django.core.management.base import BaseCommand
 from django.core.management import call_command
 from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+import hashlib
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+# Fingerprint of the last collected static sources, stored in STATIC_ROOT
+DEPLOY_STATE_FILE = '.deploy_state'
+
 class Command(BaseCommand):
     help = 'Run deployment tasks including migrations'
 
@@ -17,15 +25,23 @@ class Command(BaseCommand):
                 cursor.execute("SELECT 1")
             self.stdout.write(self.style.SUCCESS('Database connection successful'))
             
-            # Run migrations
-            self.stdout.write('Running database migrations...')
-            call_command('migrate', verbosity=1)
-            self.stdout.write(self.style.SUCCESS('Migrations completed successfully'))
+            # Run migrations (if needed)
+            if self._has_pending_migrations():
+                self.stdout.write('Running database migrations...')
+                call_command('migrate', verbosity=1)
+                self.stdout.write(self.style.SUCCESS('Migrations completed successfully'))
+            else:
+                self.stdout.write('No migrations to apply')
             
             # Collect static files (if needed)
-            self.stdout.write('Collecting static files...')
-            call_command('collectstatic', '--noinput', verbosity=1)
-            self.stdout.write(self.style.SUCCESS('Static files collected'))
+            fingerprint = self._static_fingerprint()
+            if fingerprint != self._read_deploy_state():
+                self.stdout.write('Collecting static files...')
+                call_command('collectstatic', '--noinput', '--no-post-process', verbosity=0)
+                self._write_deploy_state(fingerprint)
+                self.stdout.write(self.style.SUCCESS('Static files collected'))
+            else:
+                self.stdout.write('Static files unchanged, skipping collectstatic')
             
             self.stdout.write(self.style.SUCCESS('Deployment completed successfully'))
             
@@ -33,3 +49,44 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'Deployment failed: {str(e)}'))
             logger.error(f'Deployment failed: {str(e)}')
             raise
+    
+    def _has_pending_migrations(self):
+        """
+        Return True if any migration has not been applied to the database yet.
+        """
+        executor = MigrationExecutor(connection)
+        targets = executor.loader.graph.leaf_nodes()
+        return bool(executor.migration_plan(targets))
+    
+    def _static_fingerprint(self):
+        """
+        Hash the path, size and mtime of every static source file.
+        
+        Only file metadata is read, so this is much cheaper than letting
+        collectstatic compare every file against STATIC_ROOT.
+        """
+        # Directory listing order is not guaranteed, so sort for a stable hash
+        full_paths = sorted(
+            storage.path(path)
+            for finder in get_finders()
+            for path, storage in finder.list([])
+        )
+        digest = hashlib.sha256()
+        for full_path in full_paths:
+            stat = os.stat(full_path)
+            digest.update(f'{full_path}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode())
+        return digest.hexdigest()
+    
+    def _deploy_state_path(self):
+        return os.path.join(settings.STATIC_ROOT, DEPLOY_STATE_FILE)
+    
+    def _read_deploy_state(self):
+        try:
+            with open(self._deploy_state_path(), 'r') as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+    
+    def _write_deploy_state(self, fingerprint):
+        with open(self._deploy_state_path(), 'w') as f:
+            f.write(fingerprint)
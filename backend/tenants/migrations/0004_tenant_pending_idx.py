@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-15 03:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tenants", "0003_alter_tenant_options_and_more"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="tenant",
+            name="tenants_ten_status_e7eaee_idx",
+        ),
+        migrations.AddIndex(
+            model_name="tenant",
+            index=models.Index(
+                condition=models.Q(("status__in", ["PROVISIONING", "ERROR"])),
+                fields=["status"],
+                name="tenant_pending_idx",
+            ),
+        ),
+    ]
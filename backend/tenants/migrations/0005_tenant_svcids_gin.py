@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def create_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS tenant_svcids_gin "
+        "ON tenants_tenant USING gin (render_service_ids)"
+    )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS tenant_svcids_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tenants", "0004_tenant_pending_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_gin_index, drop_gin_index),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-15 03:44
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.functions.text
+
+
+def check_case_duplicate_names(apps, schema_editor):
+    """
+    Refuse to add the constraint while tenant names differ only by case.
+
+    Which tenant keeps the name is a business decision, so duplicates are
+    reported for manual cleanup (see DEPLOYMENT.md) rather than renamed.
+    """
+    Tenant = apps.get_model("tenants", "Tenant")
+    duplicates = list(
+        Tenant.objects.using(schema_editor.connection.alias)
+        .values(name_upper=django.db.models.functions.text.Upper("name"))
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+        .values_list("name_upper", flat=True)
+    )
+    if duplicates:
+        raise RuntimeError(
+            "Cannot add tenant_name_ci_uniq: tenant names differ only by case "
+            f"for {', '.join(sorted(duplicates))}. Rename the duplicates and "
+            "re-run migrate."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tenants", "0005_tenant_svcids_gin"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_case_duplicate_names, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="tenant",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Upper("name"),
+                name="tenant_name_ci_uniq",
+            ),
+        ),
+    ]
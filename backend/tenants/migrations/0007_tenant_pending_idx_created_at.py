@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-15 03:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tenants", "0006_tenant_name_ci_uniq"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="tenant",
+            name="tenant_pending_idx",
+        ),
+        migrations.AddIndex(
+            model_name="tenant",
+            index=models.Index(
+                condition=models.Q(("status__in", ["PROVISIONING", "ERROR"])),
+                fields=["status", "created_at"],
+                name="tenant_pending_idx",
+            ),
+        ),
+    ]
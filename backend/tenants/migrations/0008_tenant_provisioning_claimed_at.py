@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-15 03:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tenants", "0007_tenant_pending_idx_created_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tenant",
+            name="provisioning_claimed_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
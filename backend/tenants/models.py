@@ -1,4 +1,32 @@
-from django.db import models
+import json
+
+from django.db import connections, models
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Upper
+
+class TenantQuerySet(models.QuerySet):
+    def owning_service(self, service_id):
+        """
+        Filter to the tenant(s) whose render_service_ids contain the given service ID.
+        
+        On PostgreSQL this is a jsonpath match served by the tenant_svcids_gin
+        index; other backends fall back to scanning the JSON values.
+        """
+        column = f'"{self.model._meta.db_table}"."render_service_ids"'
+        if connections[self.db].vendor == 'postgresql':
+            condition = RawSQL(
+                f"{column} @? %s::jsonpath",
+                [f"$.* ? (@ == {json.dumps(service_id)})"],
+                output_field=BooleanField(),
+            )
+        else:
+            condition = RawSQL(
+                f"EXISTS (SELECT 1 FROM json_each({column}) WHERE json_each.value = %s)",
+                [service_id],
+                output_field=BooleanField(),
+            )
+        return self.filter(condition)
 
 class Tenant(models.Model):
     class TenantStatus(models.TextChoices):
@@ -15,21 +43,36 @@ class Tenant(models.Model):
         choices=TenantStatus.choices, 
         default=TenantStatus.PROVISIONING
     )
-    # Stores the unique IDs of all Render services for this tenant
+    # Stores the unique IDs of all Render services for this tenant.
+    # Backed by a GIN index on PostgreSQL (see migration 0005), which is not
+    # declared in Meta.indexes because other backends cannot build it.
     render_service_ids = models.JSONField(default=dict, blank=True) 
     # Optional custom plugin repository URL for personalized code
     custom_plugin_repo = models.URLField(blank=True, null=True, help_text="Git repository URL for custom plugins")
+    # Set by the provisioning task when it takes ownership of the deployment,
+    # so a second task for the same tenant does not deploy again
+    provisioning_claimed_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = TenantQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Tenant'
         verbose_name_plural = 'Tenants'
         ordering = ['-created_at']  # Most recent first
         indexes = [
-            models.Index(fields=['status']),  # For filtering by status
             models.Index(fields=['created_at']),  # For date-based queries
             models.Index(fields=['name']),  # For name searches
-            models.Index(fields=['status', 'created_at']),  # Composite index for status + date queries
+            models.Index(fields=['status', 'created_at']),  # Composite index for status + date queries (also covers status-only filters)
+            models.Index(
+                fields=['status', 'created_at'],
+                name='tenant_pending_idx',
+                condition=Q(status__in=['PROVISIONING', 'ERROR']),
+            ),  # Partial index for listing tenants with pending or failed provisioning, oldest first
+        ]
+        constraints = [
+            # Tenant names are unique regardless of case
+            models.UniqueConstraint(Upper('name'), name='tenant_name_ci_uniq'),
         ]
 
     def __str__(self):
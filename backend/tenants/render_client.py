@@ -1,12 +1,124 @@
 import os
+import copy
+import pickle
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import orjson
 import yaml
-import requests
 import logging
-from typing import Dict, Any, Optional
-from urllib.parse import urljoin
+from typing import Dict, Any, Iterable, Optional
+from django.core.cache import cache
+
+try:
+    # libyaml C bindings, bundled with the PyYAML wheels on most platforms
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
 
 logger = logging.getLogger(__name__)
 
+# Seconds a fetched service status is served from cache before re-querying Render
+SERVICE_STATUS_CACHE_TIMEOUT = 15
+
+# Retry policy for idempotent Render API calls. POST is never retried so
+# a blueprint deployment cannot be submitted twice.
+RETRY_METHODS = frozenset({'GET', 'DELETE'})
+RETRY_STATUS_CODES = frozenset({429, 502, 503, 504})
+MAX_RETRIES = 3
+RETRY_BACKOFF_FACTOR = 0.3
+
+BLUEPRINT_TEMPLATE_PATH = os.path.join(
+    os.path.dirname(__file__), 
+    'base_crm_render.yaml'
+)
+
+# Where a tenant's custom plugin repository is checked out in the backend image
+CUSTOM_PLUGINS_PATH = '/app/custom-plugins'
+
+# Pickled parse of the template, reused across cold starts while the YAML mtime is unchanged.
+# Looked up at call time, so tests can point it at a temporary directory.
+BLUEPRINT_CACHE_PATH = f"{BLUEPRINT_TEMPLATE_PATH}.pkl"
+
+# Parsed template shared by every client in the process, populated on first use
+_TEMPLATE_CACHE: Optional[Dict[str, Any]] = None
+_TEMPLATE_LOCK = threading.Lock()
+
+def _load_blueprint_template() -> Dict[str, Any]:
+    """
+    Return the parsed base blueprint template, parsing it once per process.
+    
+    The template only changes between deploys. The lock ensures concurrent
+    threads (e.g. a threaded Celery pool) do not each parse it on a cold
+    start; failures are not cached and will be retried on the next call.
+    The returned dict is shared and must not be mutated.
+    """
+    global _TEMPLATE_CACHE
+    if _TEMPLATE_CACHE is None:
+        with _TEMPLATE_LOCK:
+            if _TEMPLATE_CACHE is None:
+                _TEMPLATE_CACHE = _parse_blueprint_template()
+    return _TEMPLATE_CACHE
+
+def _parse_blueprint_template() -> Dict[str, Any]:
+    """
+    Parse the base blueprint template, reusing the pickled parse next to the
+    YAML file when its mtime is unchanged.
+    """
+    try:
+        mtime = os.stat(BLUEPRINT_TEMPLATE_PATH).st_mtime_ns
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Blueprint template not found at {BLUEPRINT_TEMPLATE_PATH}")
+    
+    blueprint = _read_blueprint_cache(mtime)
+    if blueprint is not None:
+        logger.info("Loaded blueprint template from cache")
+        return blueprint
+    
+    try:
+        with open(BLUEPRINT_TEMPLATE_PATH, 'r') as f:
+            blueprint = yaml.load(f, Loader=SafeLoader)
+        logger.info("Successfully loaded blueprint template")
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Blueprint template not found at {BLUEPRINT_TEMPLATE_PATH}")
+    except yaml.YAMLError as e:
+        raise ValueError(f"Invalid YAML in blueprint template: {e}")
+    
+    _write_blueprint_cache(mtime, blueprint)
+    return blueprint
+
+def _read_blueprint_cache(mtime: int) -> Optional[Dict[str, Any]]:
+    """
+    Return the pickled blueprint if it was built from a template with this mtime.
+    """
+    try:
+        with open(BLUEPRINT_CACHE_PATH, 'rb') as f:
+            cached_mtime, blueprint = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable blueprint cache {BLUEPRINT_CACHE_PATH}: {e}")
+        return None
+    return blueprint if cached_mtime == mtime else None
+
+def _write_blueprint_cache(mtime: int, blueprint: Dict[str, Any]) -> None:
+    """
+    Atomically pickle the parsed blueprint; a read-only filesystem is not an error.
+    """
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(BLUEPRINT_CACHE_PATH), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((mtime, blueprint), f, protocol=5)
+            os.replace(tmp_path, BLUEPRINT_CACHE_PATH)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError as e:
+        logger.warning(f"Could not write blueprint cache {BLUEPRINT_CACHE_PATH}: {e}")
+
 class RenderAPIClient:
     """
     Client for interacting with the Render API.
@@ -14,7 +126,12 @@ class RenderAPIClient:
     Handles authentication, blueprint deployment, and service management.
     """
     
-    def __init__(self):
+    def __init__(self, transport: Optional[httpx.BaseTransport] = None):
+        """
+        Args:
+            transport: Optional httpx transport, e.g. httpx.MockTransport in
+                tests; defaults to a pooled HTTP/2 transport
+        """
         self.api_key = os.getenv('RENDER_API_KEY')
         if not self.api_key:
             raise ValueError("RENDER_API_KEY environment variable is required")
@@ -25,6 +142,42 @@ class RenderAPIClient:
             'Content-Type': 'application/json',
             'Accept': 'application/json',
         }
+        
+        # A single HTTP/2 connection multiplexes concurrent Render API calls;
+        # httpx falls back to pooled HTTP/1.1 keep-alive if h2 is not negotiated.
+        # Connection failures are retried by the transport.
+        self.client = httpx.Client(
+            base_url=self.base_url,
+            headers=self.headers,
+            timeout=httpx.Timeout(30, connect=5),
+            transport=transport or httpx.HTTPTransport(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+                retries=MAX_RETRIES,
+            ),
+        )
+    
+    def close(self):
+        """
+        Close the underlying HTTP client and release pooled connections.
+        """
+        self.client.close()
+    
+    def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send a request, retrying idempotent methods on throttling and gateway errors.
+        """
+        attempt = 0
+        while True:
+            response = self.client.request(method, url, **kwargs)
+            if (
+                method not in RETRY_METHODS
+                or response.status_code not in RETRY_STATUS_CODES
+                or attempt >= MAX_RETRIES
+            ):
+                return response
+            time.sleep(RETRY_BACKOFF_FACTOR * (2 ** attempt))
+            attempt += 1
     
     def deploy_blueprint(self, blueprint_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -37,15 +190,16 @@ class RenderAPIClient:
             Dict containing the deployment response with service information
             
         Raises:
-            requests.RequestException: If the API request fails
+            httpx.HTTPError: If the API request fails
         """
-        url = urljoin(self.base_url, "blueprints")
+        url = "blueprints"
         
         logger.info("Deploying blueprint to Render")
-        response = requests.post(url, headers=self.headers, json=blueprint_data)
+        # Serialize with orjson; the client already sends the JSON Content-Type
+        response = self._request('POST', url, content=orjson.dumps(blueprint_data))
         response.raise_for_status()
         
-        deployment_data = response.json()
+        deployment_data = orjson.loads(response.content)
         logger.info(f"Successfully deployed blueprint. Deployment ID: {deployment_data.get('id')}")
         
         return deployment_data
@@ -61,18 +215,20 @@ class RenderAPIClient:
             True if deletion was successful
             
         Raises:
-            requests.RequestException: If the API request fails
+            httpx.HTTPError: If the API request fails
         """
-        url = urljoin(self.base_url, f"services/{service_id}")
+        url = f"services/{service_id}"
         
         logger.info(f"Deleting service {service_id} from Render")
-        response = requests.delete(url, headers=self.headers)
+        response = self._request('DELETE', url)
         
         if response.status_code == 404:
             logger.warning(f"Service {service_id} not found (may already be deleted)")
+            self.invalidate_service_status(service_id)
             return True
         
         response.raise_for_status()
+        self.invalidate_service_status(service_id)
         logger.info(f"Successfully deleted service {service_id}")
         
         return True
@@ -81,19 +237,96 @@ class RenderAPIClient:
         """
         Get the status of a service.
         
+        Successful responses are cached for SERVICE_STATUS_CACHE_TIMEOUT
+        seconds so repeated polls do not hit the Render API.
+        
         Args:
             service_id: The ID of the service
             
         Returns:
             Service status information or None if not found
         """
-        url = urljoin(self.base_url, f"services/{service_id}")
+        cache_key = self._service_status_cache_key(service_id)
+        status_info = cache.get(cache_key)
+        if status_info is not None:
+            return status_info
+        
+        status_info = self._fetch_service_status(service_id)
+        if status_info is not None:
+            cache.set(cache_key, status_info, timeout=SERVICE_STATUS_CACHE_TIMEOUT)
+        return status_info
+    
+    def get_service_statuses(
+        self, 
+        service_ids: Iterable[str], 
+        max_workers: int = 16
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Get the status of several services at once.
+        
+        Cached statuses are read with a single cache round-trip and only the
+        misses are fetched from Render, concurrently. The cache is only used
+        from the calling thread: Django cache connections are per-thread, so
+        touching it from short-lived pool threads would open a new connection
+        pool per thread.
+        
+        Args:
+            service_ids: The IDs of the services
+            max_workers: Upper bound on concurrent Render API calls
+            
+        Returns:
+            Dict of service ID to status information (None if not found)
+        """
+        cache_keys = {
+            service_id: self._service_status_cache_key(service_id) 
+            for service_id in service_ids
+        }
+        cached = cache.get_many(cache_keys.values())
+        statuses = {
+            service_id: cached.get(cache_key) 
+            for service_id, cache_key in cache_keys.items()
+        }
+        
+        misses = [service_id for service_id, status_info in statuses.items() if status_info is None]
+        if misses:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(misses))) as executor:
+                fetched = dict(zip(misses, executor.map(self._fetch_service_status, misses)))
+            statuses.update(fetched)
+            cache.set_many(
+                {
+                    cache_keys[service_id]: status_info 
+                    for service_id, status_info in fetched.items() 
+                    if status_info is not None
+                },
+                timeout=SERVICE_STATUS_CACHE_TIMEOUT
+            )
+        
+        return statuses
+    
+    def invalidate_service_status(self, service_id: str) -> None:
+        """
+        Drop any cached status for a service.
+        
+        Args:
+            service_id: The ID of the service
+        """
+        cache.delete(self._service_status_cache_key(service_id))
+    
+    @staticmethod
+    def _service_status_cache_key(service_id: str) -> str:
+        return f"render:svc_status:{service_id}"
+    
+    def _fetch_service_status(self, service_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch the status of a service directly from the Render API.
+        """
+        url = f"services/{service_id}"
         
         try:
-            response = requests.get(url, headers=self.headers)
+            response = self._request('GET', url)
             response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
+            return orjson.loads(response.content)
+        except (httpx.HTTPError, orjson.JSONDecodeError) as e:
             logger.error(f"Failed to get service status for {service_id}: {e}")
             return None
     
@@ -101,23 +334,13 @@ class RenderAPIClient:
         """
         Load the base blueprint template from the render.yaml file.
         
+        The file is parsed once per process; each call returns a deep copy
+        so callers may mutate the result freely.
+        
         Returns:
             The blueprint configuration as a dictionary
         """
-        blueprint_path = os.path.join(
-            os.path.dirname(__file__), 
-            'base_crm_render.yaml'
-        )
-        
-        try:
-            with open(blueprint_path, 'r') as f:
-                blueprint = yaml.safe_load(f)
-            logger.info("Successfully loaded blueprint template")
-            return blueprint
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Blueprint template not found at {blueprint_path}")
-        except yaml.YAMLError as e:
-            raise ValueError(f"Invalid YAML in blueprint template: {e}")
+        return copy.deepcopy(_load_blueprint_template())
     
     def customize_blueprint_for_tenant(
         self, 
@@ -137,40 +360,80 @@ class RenderAPIClient:
             The customized blueprint configuration
         """
         # Create a deep copy to avoid modifying the original
-        customized_blueprint = yaml.safe_load(yaml.dump(blueprint))
+        customized_blueprint = copy.deepcopy(blueprint)
         
-        # Customize service names to avoid conflicts
+        # Customize service names, environment variables and build commands in
+        # a single pass. The backend role is determined from the original name,
+        # before the tenant suffix is appended.
         for service in customized_blueprint.get('services', []):
-            if 'name' in service:
-                service['name'] = f"{service['name']}-{tenant_slug}"
+            original_name = service.get('name')
+            if original_name:
+                service['name'] = f"{original_name}-{tenant_slug}"
+            
+            # Customize environment variables to include tenant-specific values
+            if service.get('type') != 'web' or 'envVars' not in service:
+                continue
+            
+            # Add tenant-specific environment variables
+            service['envVars'].extend([
+                {'key': 'TENANT_SLUG', 'value': tenant_slug},
+                {'key': 'TENANT_NAME', 'value': f"tenant-{tenant_slug}"}
+            ])
+            
+            # If custom plugin repo is provided, make it available to the build
+            if custom_plugin_repo and original_name and original_name.endswith('-backend'):
+                current_build_command = service.get('buildCommand', '')
+                if current_build_command:
+                    # Add git clone command for custom plugins
+                    plugin_setup = f"git clone {custom_plugin_repo} {CUSTOM_PLUGINS_PATH} && "
+                    service['buildCommand'] = plugin_setup + current_build_command
+                else:
+                    # Docker services build from their Dockerfile, which has no
+                    # build command to extend; Render passes env vars to the
+                    # build as build args, so the Dockerfile clones the repo
+                    # from ARG CUSTOM_PLUGINS_REPO
+                    service['envVars'].append({
+                        'key': 'CUSTOM_PLUGINS_REPO', 
+                        'value': custom_plugin_repo
+                    })
+                
+                # Add environment variable for custom plugins path
+                service['envVars'].append({
+                    'key': 'CUSTOM_PLUGINS_PATH', 
+                    'value': CUSTOM_PLUGINS_PATH
+                })
         
         # Customize database names
         for database in customized_blueprint.get('databases', []):
             if 'name' in database:
                 database['name'] = f"{database['name']}-{tenant_slug}"
         
-        # Customize environment variables to include tenant-specific values
-        for service in customized_blueprint.get('services', []):
-            if service.get('type') == 'web' and 'envVars' in service:
-                # Add tenant-specific environment variables
-                service['envVars'].extend([
-                    {'key': 'TENANT_SLUG', 'value': tenant_slug},
-                    {'key': 'TENANT_NAME', 'value': f"tenant-{tenant_slug}"}
-                ])
-                
-                # If custom plugin repo is provided, modify the build command
-                if custom_plugin_repo and service.get('name', '').endswith('-backend'):
-                    current_build_command = service.get('buildCommand', '')
-                    if current_build_command:
-                        # Add git clone command for custom plugins
-                        plugin_setup = f"git clone {custom_plugin_repo} /app/custom-plugins && "
-                        service['buildCommand'] = plugin_setup + current_build_command
-                        
-                        # Add environment variable for custom plugins path
-                        service['envVars'].append({
-                            'key': 'CUSTOM_PLUGINS_PATH', 
-                            'value': '/app/custom-plugins'
-                        })
-        
         logger.info(f"Customized blueprint for tenant {tenant_slug}")
         return customized_blueprint
+
+_CLIENT: Optional[RenderAPIClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+def get_client() -> RenderAPIClient:
+    """
+    Return the process-wide RenderAPIClient, creating it on first use.
+    
+    Sharing one client keeps its pooled HTTP connections warm across tasks
+    handled by the same worker process.
+    """
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = RenderAPIClient()
+    return _CLIENT
+
+def close_client() -> None:
+    """
+    Close and discard the process-wide RenderAPIClient, if one was created.
+    """
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is not None:
+            _CLIENT.close()
+            _CLIENT = None
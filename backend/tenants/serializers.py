@@ -4,4 +4,15 @@ from .models import Tenant
 class TenantSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tenant
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class TenantListSerializer(serializers.ModelSerializer):
+    """
+    Summary representation used by the tenant list endpoint.
+    
+    Omits render_service_ids, which is only needed when looking at a single
+    tenant (detail and status endpoints).
+    """
+    class Meta:
+        model = Tenant
+        fields = ('id', 'name', 'slug', 'status', 'custom_plugin_repo', 'created_at')
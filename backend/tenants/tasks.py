@@ -1,12 +1,47 @@
 import logging
-from celery import shared_task
-from django.db import transaction
+from datetime import timedelta
+import httpx
+from celery import chord, group, shared_task
+from celery.signals import worker_process_init, worker_process_shutdown
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Upper
+from django.utils import timezone
 from .models import Tenant
-from .render_client import RenderAPIClient
+from .render_client import close_client, get_client
 
 logger = logging.getLogger(__name__)
 
-@shared_task(bind=True, max_retries=3)
+# Upper bound on concurrent Render API calls issued for a single tenant
+MAX_PARALLEL_REQUESTS = 16
+
+# Number of rows per INSERT when onboarding tenants in bulk
+BULK_CREATE_BATCH_SIZE = 500
+
+# Hard time limit of a provisioning run, in seconds. A claim older than this
+# cannot belong to a live task (e.g. its worker was killed mid-deploy), so it
+# is treated as free.
+PROVISIONING_TIME_LIMIT = 15 * 60
+
+@worker_process_init.connect
+def _init_render_client(**kwargs):
+    """
+    Create the Render API client eagerly in each worker process.
+    """
+    try:
+        get_client()
+    except ValueError as exc:
+        # Missing configuration; tasks will surface the error when they run
+        logger.warning(f"Render API client not initialized: {exc}")
+
+@worker_process_shutdown.connect
+def _close_render_client(**kwargs):
+    """
+    Release the Render API client's pooled connections on worker shutdown.
+    """
+    close_client()
+
+@shared_task(bind=True, max_retries=3, time_limit=PROVISIONING_TIME_LIMIT)
 def provision_tenant_infrastructure(self, tenant_id):
     """
     Background task to provision infrastructure for a tenant on Render.
@@ -21,85 +56,212 @@ def provision_tenant_infrastructure(self, tenant_id):
         tenant_id: The ID of the tenant to provision infrastructure for
     """
     try:
-        with transaction.atomic():
-            tenant = Tenant.objects.get(id=tenant_id)
-            
-            # Ensure tenant is in PROVISIONING status
-            if tenant.status != Tenant.TenantStatus.PROVISIONING:
-                logger.warning(f"Tenant {tenant_id} is not in PROVISIONING status. Current status: {tenant.status}")
-                return
-            
-            logger.info(f"Starting infrastructure provisioning for tenant: {tenant.name} (ID: {tenant_id})")
-            
-            # Initialize Render API client
-            render_client = RenderAPIClient()
-            
-            # Load the base blueprint template
-            blueprint = render_client.get_blueprint_template()
-            
-            # Customize the blueprint for this tenant
-            customized_blueprint = render_client.customize_blueprint_for_tenant(
-                blueprint=blueprint,
-                tenant_slug=tenant.slug,
-                custom_plugin_repo=tenant.custom_plugin_repo
+        # Claim the tenant with a conditional UPDATE before calling Render.
+        # The claim stays visible for the whole deployment, so a concurrent
+        # task for the same tenant (e.g. a retry racing a manual re-trigger)
+        # matches no row and returns instead of deploying a second blueprint.
+        # Claims left behind by a killed worker expire after the time limit.
+        now = timezone.now()
+        claimed = Tenant.objects.filter(
+            Q(provisioning_claimed_at__isnull=True)
+            | Q(provisioning_claimed_at__lt=now - timedelta(seconds=PROVISIONING_TIME_LIMIT)),
+            id=tenant_id,
+            status=Tenant.TenantStatus.PROVISIONING,
+        ).update(provisioning_claimed_at=now)
+        
+        if not claimed:
+            logger.warning(
+                f"Tenant {tenant_id} not found, not in PROVISIONING status, "
+                f"or already being provisioned by another worker"
             )
-            
-            # Deploy the blueprint to Render
-            deployment_data = render_client.deploy_blueprint(customized_blueprint)
-            
-            # Extract service IDs from the deployment response
-            service_ids = {}
-            if 'services' in deployment_data:
-                for service_info in deployment_data['services']:
-                    if 'service' in service_info:
-                        service_name = service_info['service'].get('name', '')
-                        service_id = service_info['service'].get('id', '')
-                        if service_name and service_id:
-                            # Store with the original service name (without tenant suffix)
-                            original_name = service_name.replace(f"-{tenant.slug}", "")
-                            service_ids[original_name] = service_id
-            
-            # Update tenant with service IDs and mark as ACTIVE
-            tenant.render_service_ids = service_ids
-            tenant.status = Tenant.TenantStatus.ACTIVE
-            tenant.save()
-            
-            logger.info(f"Successfully provisioned infrastructure for tenant: {tenant.name} (ID: {tenant_id})")
-            logger.info(f"Deployed services: {list(service_ids.keys())}")
-            
-    except Tenant.DoesNotExist:
-        logger.error(f"Tenant with ID {tenant_id} not found")
-        raise
+            return
+        
+        tenant = Tenant.objects.only('name', 'slug', 'custom_plugin_repo').get(id=tenant_id)
+        
+        logger.info(f"Starting infrastructure provisioning for tenant: {tenant.name} (ID: {tenant_id})")
+        
+        # Get the process-wide Render API client
+        render_client = get_client()
+        
+        # Load the base blueprint template
+        blueprint = render_client.get_blueprint_template()
+        
+        # Customize the blueprint for this tenant
+        customized_blueprint = render_client.customize_blueprint_for_tenant(
+            blueprint=blueprint,
+            tenant_slug=tenant.slug,
+            custom_plugin_repo=tenant.custom_plugin_repo
+        )
+        
+        # Deploy the blueprint to Render
+        deployment_data = render_client.deploy_blueprint(customized_blueprint)
+        
+        # Extract service IDs from the deployment response, keyed by the
+        # original service name (without tenant suffix)
+        service_ids = extract_service_ids(deployment_data, tenant.slug)
+        
+        # Update tenant with service IDs and mark as ACTIVE in a single UPDATE
+        Tenant.objects.filter(pk=tenant_id).update(
+            render_service_ids=service_ids,
+            status=Tenant.TenantStatus.ACTIVE,
+        )
+        
+        # Make sure status polls see the freshly deployed services
+        for service_id in service_ids.values():
+            render_client.invalidate_service_status(service_id)
+        
+        logger.info(f"Successfully provisioned infrastructure for tenant: {tenant.name} (ID: {tenant_id})")
+        logger.info(f"Deployed services: {list(service_ids.keys())}")
+        
     except ValueError as exc:
         # Configuration error (e.g., missing API key)
         logger.error(f"Configuration error for tenant {tenant_id}: {str(exc)}")
-        try:
-            tenant = Tenant.objects.get(id=tenant_id)
-            tenant.status = Tenant.TenantStatus.ERROR
-            tenant.save()
-        except Tenant.DoesNotExist:
-            pass
+        _mark_tenant_error(tenant_id)
         raise
     except Exception as exc:
         logger.error(f"Error provisioning infrastructure for tenant {tenant_id}: {str(exc)}")
         
         # Update tenant status to ERROR
-        try:
-            tenant = Tenant.objects.get(id=tenant_id)
-            tenant.status = Tenant.TenantStatus.ERROR
-            tenant.save()
-        except Tenant.DoesNotExist:
-            pass
+        _mark_tenant_error(tenant_id)
         
         # Retry the task with exponential backoff
         raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
 
+@shared_task
+def mark_provisioning_failed(request, exc, traceback, tenant_id):
+    """
+    Error callback for provision_tenant_infrastructure.
+    
+    Marks the tenant as ERROR once provisioning has failed for good, including
+    failures the task cannot handle itself (e.g. the worker being killed).
+    
+    Args:
+        request: The failed task's request context
+        exc: The exception raised by the failed task
+        traceback: The failed task's traceback
+        tenant_id: The ID of the tenant whose provisioning failed
+    """
+    logger.error(f"Provisioning task {request.id} failed for tenant {tenant_id}: {exc}")
+    _mark_tenant_error(tenant_id)
+
+def extract_service_ids(deployment_data, tenant_slug):
+    """
+    Map original service names to Render service IDs from a deployment response.
+    
+    Args:
+        deployment_data: The Render blueprint deployment response
+        tenant_slug: The tenant slug appended to every service name
+    
+    Returns:
+        Dict of service name (without tenant suffix) to Render service ID
+    """
+    suffix = f"-{tenant_slug}"
+    services = (
+        service_info['service']
+        for service_info in deployment_data.get('services', [])
+        if 'service' in service_info
+    )
+    return {
+        service['name'].removesuffix(suffix): service['id']
+        for service in services
+        if service.get('name') and service.get('id')
+    }
+
+def _mark_tenant_error(tenant_id):
+    """
+    Flip a tenant to ERROR status with a single UPDATE.
+    
+    The provisioning claim is released so the tenant can be provisioned again
+    once it is put back into PROVISIONING. A tenant that no longer exists is
+    silently ignored.
+    
+    Args:
+        tenant_id: The ID of the tenant to mark as errored
+    """
+    Tenant.objects.filter(pk=tenant_id).update(
+        status=Tenant.TenantStatus.ERROR,
+        provisioning_claimed_at=None,
+    )
+
+def bulk_onboard_tenants(rows):
+    """
+    Create many tenants at once and queue infrastructure provisioning for them.
+    
+    Rows are inserted with batched multi-row INSERTs instead of one round-trip
+    per tenant. Rows whose slug or name (case-insensitively) already exists, or
+    repeats an earlier row, are skipped. Provisioning is only queued for the
+    tenants this call inserted, so re-running an import, or racing a
+    concurrent one, never queues a second deployment for a tenant. Tasks are
+    sent once the surrounding transaction, if any, commits.
+    
+    Args:
+        rows: Iterable of dicts with Tenant field values
+            (e.g. ``name``, ``slug``, ``custom_plugin_repo``)
+    
+    Returns:
+        List of IDs of the newly created tenants
+    """
+    rows = list(rows)
+    existing = Tenant.objects.annotate(name_upper=Upper('name')).filter(
+        Q(slug__in=[row['slug'] for row in rows])
+        | Q(name_upper__in=[row['name'].upper() for row in rows])
+    ).values_list('slug', 'name_upper')
+    seen_slugs = {slug for slug, _ in existing}
+    seen_names = {name_upper for _, name_upper in existing}
+    
+    new_rows = []
+    for row in rows:
+        if row['slug'] in seen_slugs or row['name'].upper() in seen_names:
+            continue
+        seen_slugs.add(row['slug'])
+        seen_names.add(row['name'].upper())
+        new_rows.append(row)
+    
+    if not new_rows:
+        logger.info("No new tenants to onboard")
+        return []
+    
+    try:
+        with transaction.atomic():
+            created = Tenant.objects.bulk_create(
+                [Tenant(**row) for row in new_rows], batch_size=BULK_CREATE_BATCH_SIZE
+            )
+    except IntegrityError:
+        # A concurrent import inserted some of the same tenants; insert row by
+        # row and leave the ones it created to that import.
+        logger.warning("Bulk onboarding conflicted with existing tenants, inserting row by row")
+        created = []
+        for row in new_rows:
+            try:
+                with transaction.atomic():
+                    created.append(Tenant.objects.create(**row))
+            except IntegrityError:
+                logger.info(f"Skipping tenant {row['slug']}: created concurrently")
+    
+    tenant_ids = [tenant.id for tenant in created]
+    if not tenant_ids:
+        logger.info("No new tenants to onboard")
+        return []
+    
+    # Send once the rows are committed; a worker picking a task up earlier
+    # would not see its tenant and return without provisioning it
+    transaction.on_commit(lambda: group(
+        provision_tenant_infrastructure.s(tenant_id).on_error(mark_provisioning_failed.s(tenant_id))
+        for tenant_id in tenant_ids
+    ).apply_async())
+    
+    logger.info(f"Onboarded {len(tenant_ids)} tenants, infrastructure provisioning queued")
+    return tenant_ids
+
 @shared_task
 def cleanup_tenant_infrastructure(tenant_id):
     """
     Background task to clean up infrastructure for a tenant on Render.
     
-    This task will delete all Render services associated with the tenant.
+    This task fans out one delete_render_service task per Render service
+    associated with the tenant, so deletions run in parallel across workers
+    and each has its own retry budget. Once all of them succeed,
+    finalize_tenant_cleanup marks the tenant as SUSPENDED.
     
     Args:
         tenant_id: The ID of the tenant to clean up infrastructure for
@@ -109,18 +271,17 @@ def cleanup_tenant_infrastructure(tenant_id):
         
         logger.info(f"Starting infrastructure cleanup for tenant: {tenant.name} (ID: {tenant_id})")
         
-        # Initialize Render API client
-        render_client = RenderAPIClient()
-        
-        # Delete all services associated with this tenant
-        _delete_render_services(tenant, render_client)
+        service_ids = list(tenant.render_service_ids.values())
+        if not service_ids:
+            logger.info(f"No services to delete for tenant {tenant.name}")
+            finalize_tenant_cleanup([], tenant_id)
+            return
         
-        # Update tenant status
-        tenant.status = Tenant.TenantStatus.SUSPENDED
-        tenant.render_service_ids = {}
-        tenant.save()
+        chord(
+            delete_render_service.s(service_id) for service_id in service_ids
+        )(finalize_tenant_cleanup.s(tenant_id))
         
-        logger.info(f"Successfully cleaned up infrastructure for tenant: {tenant.name} (ID: {tenant_id})")
+        logger.info(f"Queued deletion of {len(service_ids)} services for tenant: {tenant.name} (ID: {tenant_id})")
         
     except Tenant.DoesNotExist:
         logger.error(f"Tenant with ID {tenant_id} not found")
@@ -129,30 +290,34 @@ def cleanup_tenant_infrastructure(tenant_id):
         logger.error(f"Error cleaning up infrastructure for tenant {tenant_id}: {str(exc)}")
         raise
 
-def _delete_render_services(tenant, render_client):
+@shared_task(autoretry_for=(httpx.HTTPError,), retry_backoff=True, max_retries=5)
+def delete_render_service(service_id):
     """
-    Delete Render services for the tenant.
+    Background task to delete a single Render service.
     
     Args:
-        tenant: The Tenant instance
-        render_client: The RenderAPIClient instance
+        service_id: The ID of the Render service to delete
     """
-    if not tenant.render_service_ids:
-        logger.info(f"No services to delete for tenant {tenant.name}")
-        return
-    
-    logger.info(f"Deleting Render services for tenant: {tenant.name}")
+    get_client().delete_service(service_id)
+    logger.info(f"Deleted service {service_id}")
+
+@shared_task
+def finalize_tenant_cleanup(results, tenant_id):
+    """
+    Chord callback that marks a tenant as SUSPENDED once all its services are deleted.
     
-    deleted_count = 0
-    for service_name, service_id in tenant.render_service_ids.items():
-        try:
-            render_client.delete_service(service_id)
-            deleted_count += 1
-            logger.info(f"Deleted service {service_name} (ID: {service_id})")
-        except Exception as e:
-            logger.error(f"Failed to delete service {service_name} (ID: {service_id}): {e}")
+    Only runs when every delete_render_service task succeeded, so the stored
+    service IDs are kept if any deletion ultimately fails.
     
-    logger.info(f"Deleted {deleted_count} out of {len(tenant.render_service_ids)} services for tenant {tenant.name}")
+    Args:
+        results: Results of the delete_render_service tasks (unused)
+        tenant_id: The ID of the tenant that was cleaned up
+    """
+    Tenant.objects.filter(pk=tenant_id).update(
+        status=Tenant.TenantStatus.SUSPENDED,
+        render_service_ids={},
+    )
+    logger.info(f"Successfully cleaned up infrastructure for tenant ID {tenant_id}")
 
 @shared_task
 def check_tenant_service_status(tenant_id):
@@ -171,11 +336,16 @@ def check_tenant_service_status(tenant_id):
             logger.info(f"No services to check for tenant {tenant.name}")
             return
         
-        render_client = RenderAPIClient()
+        # Fetch all service statuses concurrently over the shared HTTP client,
+        # serving recently fetched ones from the cache
+        statuses = get_client().get_service_statuses(
+            tenant.render_service_ids.values(), 
+            max_workers=MAX_PARALLEL_REQUESTS
+        )
         
         service_statuses = {}
         for service_name, service_id in tenant.render_service_ids.items():
-            status_info = render_client.get_service_status(service_id)
+            status_info = statuses.get(service_id)
             if status_info:
                 service_statuses[service_name] = {
                     'status': status_info.get('status'),
@@ -1,3 +1,362 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import Mock, patch
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import IntegrityError, connection, models
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.functions import Upper
+from django.contrib.staticfiles.finders import get_finders
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .management.commands.deploy import Command as DeployCommand
+from .models import Tenant
+from .tasks import PROVISIONING_TIME_LIMIT, bulk_onboard_tenants, provision_tenant_infrastructure
+
+
+class TenantModelDefinitionTests(TestCase):
+    """
+    Guard against the Tenant model losing its indexes or fields.
+    """
+
+    def test_tenant_has_indexes(self):
+        index_names = {index.name for index in Tenant._meta.indexes}
+        self.assertIn('tenant_pending_idx', index_names)
+        self.assertTrue(all(index_names))
+
+    def test_pending_index_covers_created_at(self):
+        index = next(index for index in Tenant._meta.indexes if index.name == 'tenant_pending_idx')
+        self.assertEqual(index.fields, ['status', 'created_at'])
+
+    def test_tenant_has_custom_plugin_repo_field(self):
+        field = Tenant._meta.get_field('custom_plugin_repo')
+        self.assertIsInstance(field, models.URLField)
+
+    def test_no_missing_migrations(self):
+        call_command('makemigrations', 'tenants', '--check', '--dry-run', stdout=StringIO())
+
+
+class TenantQuerySetTests(TestCase):
+    def test_owning_service(self):
+        acme = Tenant.objects.create(
+            name='Acme', slug='acme',
+            render_service_ids={'backboneos-backend': 'srv_1', 'backboneos-frontend': 'srv_2'}
+        )
+        Tenant.objects.create(name='Other', slug='other', render_service_ids={'backboneos-backend': 'srv_3'})
+
+        self.assertEqual(list(Tenant.objects.owning_service('srv_2')), [acme])
+        self.assertFalse(Tenant.objects.owning_service('srv_missing').exists())
+
+
+@patch('tenants.tasks.provision_tenant_infrastructure.apply_async')
+class TenantCreateViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_auto_slug_skips_taken_suffixes(self, mock_apply_async):
+        Tenant.objects.create(name='Acme Old', slug='acme')
+        Tenant.objects.create(name='Acme Older', slug='acme-1')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/tenants/', {'name': 'Acme'}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['slug'], 'acme-2')
+        mock_apply_async.assert_called_once()
+        self.assertEqual(mock_apply_async.call_args.args[0], (response.data['id'],))
+
+    def test_duplicate_name_is_case_insensitive(self, mock_apply_async):
+        Tenant.objects.create(name='Acme', slug='acme')
+
+        response = self.client.post('/api/tenants/', {'name': 'ACME'}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        mock_apply_async.assert_not_called()
+
+    def test_name_uniqueness_enforced_by_database(self, mock_apply_async):
+        Tenant.objects.create(name='Acme', slug='acme')
+
+        with self.assertRaises(IntegrityError):
+            Tenant.objects.create(name='acme', slug='acme-corp')
+
+
+class TenantUpdateViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        Tenant.objects.create(name='Acme', slug='acme')
+        self.other = Tenant.objects.create(name='Globex', slug='globex')
+
+    def test_rename_to_case_variant_of_existing_name_is_rejected(self):
+        response = self.client.patch(f'/api/tenants/{self.other.id}/', {'name': 'ACME'}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('name', response.data)
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.name, 'Globex')
+
+    def test_case_only_rename_of_same_tenant_is_allowed(self):
+        response = self.client.patch(f'/api/tenants/{self.other.id}/', {'name': 'GLOBEX'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'GLOBEX')
+
+
+class TenantListViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_list_omits_render_service_ids(self):
+        Tenant.objects.create(name='Acme', slug='acme', render_service_ids={'backboneos-backend': 'srv_1'})
+
+        response = self.client.get('/api/tenants/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['slug'], 'acme')
+        self.assertNotIn('render_service_ids', response.data['results'][0])
+
+    def test_list_pages_with_cursor(self):
+        for i in range(3):
+            Tenant.objects.create(name=f'Tenant {i}', slug=f'tenant-{i}')
+
+        first = self.client.get('/api/tenants/', {'page_size': 2})
+        second = self.client.get(first.data['next'])
+
+        self.assertNotIn('count', first.data)
+        self.assertEqual([t['slug'] for t in first.data['results']], ['tenant-2', 'tenant-1'])
+        self.assertEqual([t['slug'] for t in second.data['results']], ['tenant-0'])
+        self.assertIsNone(second.data['next'])
+
+
+class TenantStatusViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        self.url = f'/api/tenants/{self.tenant.id}/status/'
+
+    def test_status_returns_etag(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], Tenant.TenantStatus.PROVISIONING)
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_status_not_modified_until_status_changes(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Tenant.objects.filter(pk=self.tenant.pk).update(status=Tenant.TenantStatus.ACTIVE)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_status_etag_changes_on_rename(self):
+        etag = self.client.get(self.url)['ETag']
+
+        rename = self.client.patch(f'/api/tenants/{self.tenant.id}/', {'name': 'Acme Renamed'}, format='json')
+        self.assertEqual(rename.status_code, 200)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'Acme Renamed')
+
+    def test_status_unknown_tenant(self):
+        self.assertEqual(self.client.get('/api/tenants/999999/status/').status_code, 404)
+
+
+class ProvisionTenantInfrastructureTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        self.render_client = Mock()
+        self.render_client.get_blueprint_template.return_value = {}
+        self.render_client.customize_blueprint_for_tenant.return_value = {}
+        self.render_client.deploy_blueprint.return_value = {
+            'services': [{'service': {'name': 'backboneos-backend-acme', 'id': 'srv_1'}}]
+        }
+        patcher = patch('tenants.tasks.get_client', return_value=self.render_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_provisions_and_activates_tenant(self):
+        provision_tenant_infrastructure(self.tenant.id)
+
+        self.tenant.refresh_from_db()
+        self.assertEqual(self.tenant.status, Tenant.TenantStatus.ACTIVE)
+        self.assertEqual(self.tenant.render_service_ids, {'backboneos-backend': 'srv_1'})
+        self.assertIsNotNone(self.tenant.provisioning_claimed_at)
+
+    def test_second_run_during_deployment_is_noop(self):
+        deploy = self.render_client.deploy_blueprint
+        deployment_data = deploy.return_value
+
+        def deploy_while_duplicate_runs(blueprint):
+            # A second task for the same tenant arrives while Render is deploying
+            provision_tenant_infrastructure(self.tenant.id)
+            return deployment_data
+
+        deploy.side_effect = deploy_while_duplicate_runs
+
+        provision_tenant_infrastructure(self.tenant.id)
+
+        deploy.assert_called_once()
+        self.tenant.refresh_from_db()
+        self.assertEqual(self.tenant.status, Tenant.TenantStatus.ACTIVE)
+
+    def test_live_claim_is_respected(self):
+        Tenant.objects.filter(pk=self.tenant.pk).update(provisioning_claimed_at=timezone.now())
+
+        provision_tenant_infrastructure(self.tenant.id)
+
+        self.render_client.deploy_blueprint.assert_not_called()
+
+    def test_stale_claim_from_killed_worker_is_taken_over(self):
+        stale = timezone.now() - timedelta(seconds=PROVISIONING_TIME_LIMIT + 60)
+        Tenant.objects.filter(pk=self.tenant.pk).update(provisioning_claimed_at=stale)
+
+        provision_tenant_infrastructure(self.tenant.id)
+
+        self.render_client.deploy_blueprint.assert_called_once()
+        self.tenant.refresh_from_db()
+        self.assertEqual(self.tenant.status, Tenant.TenantStatus.ACTIVE)
+
+    def test_failure_releases_claim(self):
+        self.render_client.deploy_blueprint.side_effect = ValueError('RENDER_API_KEY missing')
+
+        with self.assertRaises(ValueError):
+            provision_tenant_infrastructure(self.tenant.id)
+
+        self.tenant.refresh_from_db()
+        self.assertEqual(self.tenant.status, Tenant.TenantStatus.ERROR)
+        self.assertIsNone(self.tenant.provisioning_claimed_at)
+
+
+@patch('tenants.tasks.group')
+class BulkOnboardTenantsTests(TestCase):
+    def onboard(self, rows):
+        with self.captureOnCommitCallbacks(execute=True):
+            return bulk_onboard_tenants(rows)
+
+    def queued_ids(self, mock_group):
+        signatures = list(mock_group.call_args.args[0])
+        return [signature.args[0] for signature in signatures]
+
+    def test_skips_existing_and_repeated_rows(self, mock_group):
+        Tenant.objects.create(name='Acme', slug='acme')
+        Tenant.objects.create(name='Globex', slug='globex')
+
+        tenant_ids = self.onboard([
+            {'name': 'Acme Again', 'slug': 'acme'},  # existing slug
+            {'name': 'GLOBEX', 'slug': 'globex-2'},  # existing name, different case
+            {'name': 'Initech', 'slug': 'initech'},
+            {'name': 'Initech', 'slug': 'initech-2'},  # repeats the row above
+            {'name': 'Hooli', 'slug': 'hooli'},
+        ])
+
+        created = Tenant.objects.filter(slug__in=['initech', 'hooli'])
+        self.assertCountEqual(tenant_ids, created.values_list('id', flat=True))
+        self.assertEqual(Tenant.objects.count(), 4)
+        self.assertCountEqual(self.queued_ids(mock_group), tenant_ids)
+
+    def test_provisioning_is_sent_after_commit(self, mock_group):
+        with self.captureOnCommitCallbacks() as callbacks:
+            tenant_ids = bulk_onboard_tenants([{'name': 'Acme', 'slug': 'acme'}])
+            mock_group.assert_not_called()
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.queued_ids(mock_group), tenant_ids)
+
+    def test_nothing_new_queues_nothing(self, mock_group):
+        Tenant.objects.create(name='Acme', slug='acme')
+
+        self.assertEqual(self.onboard([{'name': 'Acme', 'slug': 'acme'}]), [])
+        mock_group.assert_not_called()
+
+    def test_tenant_created_concurrently_is_not_queued(self, mock_group):
+        concurrent = Tenant.objects.create(name='Acme', slug='acme')
+
+        # Another import inserted the tenant after the existence check ran
+        stale_check = Tenant.objects.annotate(name_upper=Upper('name')).none()
+        with patch.object(Tenant.objects, 'annotate', return_value=stale_check):
+            tenant_ids = self.onboard([
+                {'name': 'Acme', 'slug': 'acme'},
+                {'name': 'Hooli', 'slug': 'hooli'},
+            ])
+
+        self.assertEqual(tenant_ids, [Tenant.objects.get(slug='hooli').id])
+        queued_ids = self.queued_ids(mock_group)
+        self.assertNotIn(concurrent.id, queued_ids)
+        self.assertEqual(queued_ids, tenant_ids)
+
+
+class DeployCommandTests(TestCase):
+    def setUp(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        static_src = tempfile.TemporaryDirectory()
+        self.addCleanup(static_src.cleanup)
+        self.static_file = os.path.join(static_src.name, 'app.css')
+        with open(self.static_file, 'w') as f:
+            f.write('body {}')
+
+        settings_override = override_settings(
+            STATIC_ROOT=static_root.name,
+            STATICFILES_DIRS=[static_src.name],
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        patcher = patch('tenants.management.commands.deploy.call_command')
+        self.mock_call_command = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def unapply_latest_migration(self):
+        app_label, name = MigrationLoader(connection).graph.leaf_nodes('tenants')[0]
+        MigrationRecorder(connection).record_unapplied(app_label, name)
+
+    def deploy(self):
+        self.mock_call_command.reset_mock()
+        call_command('deploy', stdout=StringIO())
+        return [c.args[0] for c in self.mock_call_command.call_args_list]
+
+    def test_has_pending_migrations(self):
+        self.assertFalse(DeployCommand()._has_pending_migrations())
+
+        self.unapply_latest_migration()
+        self.assertTrue(DeployCommand()._has_pending_migrations())
+
+    def test_migrate_runs_only_when_migrations_are_pending(self):
+        self.assertNotIn('migrate', self.deploy())
+
+        self.unapply_latest_migration()
+        self.assertIn('migrate', self.deploy())
+
+    def test_collectstatic_runs_only_when_sources_change(self):
+        self.assertIn('collectstatic', self.deploy())
+        self.assertNotIn('collectstatic', self.deploy())
+
+        with open(self.static_file, 'a') as f:
+            f.write('a {}')
+        self.assertIn('collectstatic', self.deploy())
+        self.assertNotIn('collectstatic', self.deploy())
+
+    def test_static_fingerprint_ignores_listing_order(self):
+        class ReversedFinder:
+            def __init__(self, finder):
+                self.finder = finder
+
+            def list(self, ignore_patterns):
+                return reversed(list(self.finder.list(ignore_patterns)))
+
+        command = DeployCommand()
+        fingerprint = command._static_fingerprint()
+
+        reversed_finders = [ReversedFinder(finder) for finder in get_finders()]
+        with patch('tenants.management.commands.deploy.get_finders', return_value=reversed_finders):
+            self.assertEqual(command._static_fingerprint(), fingerprint)
@@ -2,14 +2,25 @@ from django.shortcuts import render
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.pagination import CursorPagination
 from django.utils.text import slugify
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.http import parse_etags, quote_etag
 from .models import Tenant
-from .serializers import TenantSerializer
+from .serializers import TenantListSerializer, TenantSerializer
+import hashlib
 import logging
+import orjson
+import re
 
 logger = logging.getLogger(__name__)
 
+# Fields returned by the status action
+STATUS_FIELDS = ('id', 'name', 'slug', 'status', 'render_service_ids', 'created_at')
+
 @api_view(['GET'])
 def health_check(request):
     """
@@ -22,6 +33,18 @@ def health_check(request):
 
 # Create your views here.
 
+class TenantCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the created_at index.
+    
+    Each page is a range scan starting from the cursor, so deep pages cost the
+    same as the first one and no COUNT(*) is issued.
+    """
+    ordering = '-created_at'
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
 class TenantViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing Tenant instances.
@@ -31,6 +54,19 @@ class TenantViewSet(viewsets.ModelViewSet):
     """
     queryset = Tenant.objects.all()
     serializer_class = TenantSerializer
+    pagination_class = TenantCursorPagination
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # Don't load render_service_ids for rows the list does not return it for
+            return queryset.only(*TenantListSerializer.Meta.fields)
+        return queryset
+    
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return TenantListSerializer
+        return super().get_serializer_class()
     
     def create(self, request, *args, **kwargs):
         """
@@ -60,56 +96,76 @@ class TenantViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Fetch every existing tenant that could collide on name or slug in a
+        # single query; the unique constraints on the model catch any race.
+        requested_slug = request.data.get('slug')
+        if requested_slug:
+            base_slug = slugify(requested_slug)
+            slug_filter = Q(slug=base_slug)
+        else:
+            base_slug = slugify(name)
+            slug_filter = Q(slug__regex=rf'^{re.escape(base_slug)}(-[0-9]+)?$')
+        
+        conflicts = list(
+            Tenant.objects.filter(Q(name__iexact=name) | slug_filter)
+            .values_list('name', 'slug')
+        )
+        
         # Check if tenant with this name already exists
-        if Tenant.objects.filter(name__iexact=name).exists():
+        if any(existing_name.upper() == name.upper() for existing_name, _ in conflicts):
             return Response(
                 {'error': 'A tenant with this name already exists'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
         # Generate or use provided slug
-        slug = request.data.get('slug')
-        if not slug:
-            slug = slugify(name)
-            # Ensure slug is unique
-            counter = 1
-            original_slug = slug
-            while Tenant.objects.filter(slug=slug).exists():
-                slug = f"{original_slug}-{counter}"
-                counter += 1
-        else:
+        used_slugs = {existing_slug for _, existing_slug in conflicts}
+        slug = base_slug
+        if requested_slug:
             # Validate provided slug
-            slug = slugify(slug)
-            if Tenant.objects.filter(slug=slug).exists():
+            if slug in used_slugs:
                 return Response(
                     {'error': 'A tenant with this slug already exists'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
+        else:
+            # Ensure slug is unique
+            counter = 1
+            while slug in used_slugs:
+                slug = f"{base_slug}-{counter}"
+                counter += 1
         
         try:
-            with transaction.atomic():
-                # Create tenant with PROVISIONING status
-                tenant_data = {
-                    'name': name,
-                    'slug': slug,
-                    'status': Tenant.TenantStatus.PROVISIONING,
-                    'render_service_ids': {}
-                }
-                
-                serializer = self.get_serializer(data=tenant_data)
-                serializer.is_valid(raise_exception=True)
-                tenant = serializer.save()
-                
-                # Trigger background task for infrastructure creation
-                self._trigger_infrastructure_provisioning(tenant)
-                
-                logger.info(f"Tenant '{tenant.name}' created with ID {tenant.id}, triggering infrastructure provisioning")
-                
-                return Response(
-                    serializer.data, 
-                    status=status.HTTP_201_CREATED
-                )
-                
+            # Create tenant with PROVISIONING status. The single INSERT commits
+            # on its own, so no explicit transaction is needed.
+            tenant_data = {
+                'name': name,
+                'slug': slug,
+                'status': Tenant.TenantStatus.PROVISIONING,
+                'render_service_ids': {}
+            }
+            
+            serializer = self.get_serializer(data=tenant_data)
+            serializer.is_valid(raise_exception=True)
+            tenant = serializer.save()
+            
+            # Trigger background task for infrastructure creation once the row
+            # is committed, so the worker never looks for a tenant it cannot see
+            transaction.on_commit(lambda: self._trigger_infrastructure_provisioning(tenant))
+            
+            logger.info(f"Tenant '{tenant.name}' created with ID {tenant.id}, triggering infrastructure provisioning")
+            
+            return Response(
+                serializer.data, 
+                status=status.HTTP_201_CREATED
+            )
+            
+        except IntegrityError:
+            # A concurrent request created a tenant with the same name or slug
+            return Response(
+                {'error': 'A tenant with this name or slug already exists'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             logger.error(f"Error creating tenant '{name}': {str(e)}")
             return Response(
@@ -117,6 +173,17 @@ class TenantViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    def perform_update(self, serializer):
+        """
+        Save an update, reporting a name that clashes case-insensitively with
+        another tenant (tenant_name_ci_uniq) as a validation error.
+        """
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError({'name': ['A tenant with this name already exists']})
+    
     def _trigger_infrastructure_provisioning(self, tenant):
         """
         Trigger background task for infrastructure provisioning on Render.
@@ -124,9 +191,13 @@ class TenantViewSet(viewsets.ModelViewSet):
         This method integrates with Celery for asynchronous infrastructure creation.
         """
         try:
-            from .tasks import provision_tenant_infrastructure
-            # Trigger the background task
-            provision_tenant_infrastructure.delay(tenant.id)
+            from .tasks import mark_provisioning_failed, provision_tenant_infrastructure
+            # Trigger the background task; the error callback flags the tenant
+            # if the task fails in a way its own handlers cannot catch
+            provision_tenant_infrastructure.apply_async(
+                (tenant.id,),
+                link_error=mark_provisioning_failed.s(tenant.id)
+            )
             logger.info(f"Infrastructure provisioning task queued for tenant: {tenant.name} (ID: {tenant.id})")
         except ImportError:
             # Fallback if Celery is not configured
@@ -139,13 +210,27 @@ class TenantViewSet(viewsets.ModelViewSet):
     def status(self, request, pk=None):
         """
         Get the current status of a tenant's infrastructure provisioning.
+        
+        This endpoint is polled while provisioning is in progress, so it loads
+        only the fields it returns and supports conditional requests: clients
+        sending a matching If-None-Match get an empty 304 response.
         """
-        tenant = self.get_object()
-        return Response({
+        tenant = get_object_or_404(
+            Tenant.objects.only(*STATUS_FIELDS), 
+            pk=pk
+        )
+        payload = {
             'id': tenant.id,
             'name': tenant.name,
             'slug': tenant.slug,
             'status': tenant.status,
             'render_service_ids': tenant.render_service_ids,
             'created_at': tenant.created_at
-        })
+        }
+        # Hash everything returned, so any change (e.g. a rename) busts the ETag
+        etag = quote_etag(hashlib.md5(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest())
+        
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        
+        return Response(payload, headers={'ETag': etag})